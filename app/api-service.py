@@ -1,21 +1,48 @@
 import uvicorn
 import logging.config
+from contextlib import asynccontextmanager
 from utils.logger import LOGGING_CONFIG
 from fastapi import FastAPI
-from v1.routers import auth, data, search
+from fastapi.middleware.gzip import GZipMiddleware
+from v1.routers import auth, data, search, profiles, admin
 from core.settings import AppSettings
+from core.databases.mongo import MongoManager
+from core.cache import cache_settings
+from utils.profiling import ProfilingMiddleware, profile_settings, profile_store
+from utils.tracing import TracingMiddleware, tracer
 
 
 logging.config.dictConfig(LOGGING_CONFIG)
 
 
+log = logging.getLogger()
+
+
 app_settings = AppSettings()
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        MongoManager().create_indexes()
+    except Exception as e:
+        log.error(f"Failed to create db indexes: {e}")
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(auth.router)
 app.include_router(data.router)
 app.include_router(search.router)
+app.include_router(profiles.router)
+app.include_router(admin.router)
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=cache_settings.gzip_minimum_size,
+    compresslevel=cache_settings.gzip_level,
+)
+app.add_middleware(ProfilingMiddleware, settings=profile_settings, store=profile_store)
+app.add_middleware(TracingMiddleware, tracer=tracer)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,85 @@
+"""
+Login throughput benchmark.
+
+Fires bursts of concurrent token requests together with data reads
+and reports login throughput and read latency during the burst.
+Run from the app directory with the same environment as the tests:
+
+    python benchmarks/login.py --logins 50 --reads 200
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+from importlib import import_module
+
+import httpx
+import mongomock
+
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from core.passwords import password_hasher  # noqa: E402
+
+
+async def login(client):
+    response = await client.post(
+        "/api/v1/auth/tokens",
+        data={"username": "testuser", "password": "test"},
+    )
+    assert response.status_code == 200
+
+
+async def read(client, latencies):
+    start = time.perf_counter()
+    response = await client.get("/api/v1/data/data-1")
+    latencies.append(time.perf_counter() - start)
+    assert response.status_code in (200, 404)
+
+
+async def burst(app, logins, reads, warm):
+    if not warm:
+        password_hasher.clear_cache()
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        if warm:
+            await login(client)
+        start = time.perf_counter()
+        await asyncio.gather(
+            *[login(client) for _ in range(logins)],
+            *[read(client, latencies) for _ in range(reads)],
+        )
+        elapsed = time.perf_counter() - start
+    return elapsed, latencies
+
+
+def report(name, logins, elapsed, latencies):
+    latencies = sorted(latencies)
+    print(
+        f"{name}: {logins / elapsed:.1f} logins/s, "
+        f"read p50 {statistics.median(latencies) * 1000:.1f} ms, "
+        f"read max {latencies[-1] * 1000:.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--reads", type=int, default=200)
+    args = parser.parse_args()
+
+    app = import_module("api-service").app
+    logging.disable(logging.INFO)
+    with mongomock.patch(servers=(("localhost", 27017),)):
+        for warm, name in [(False, "cold cache"), (True, "warm cache")]:
+            elapsed, latencies = asyncio.run(burst(app, args.logins, args.reads, warm))
+            report(name, args.logins, elapsed, latencies)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Metadata validation benchmark.
+
+Compares validation cost of DataPayload (with metadata limits)
+to the plain Data model for typical and large payloads:
+
+    python benchmarks/metadata.py --number 2000
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from core.schemas.data import Data, DataPayload  # noqa: E402
+
+
+def payload(width, depth):
+    def node(level):
+        if level == depth:
+            return {"enabled": "true", "value": f"value-{level}"}
+        return {f"property-{i}": node(level + 1) for i in range(width)}
+    return json.dumps({"name": "data-1", "metadata": node(0)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    payloads = {
+        "typical (8 keys)": payload(2, 2),
+        "large (~900 keys)": payload(4, 4),
+    }
+    for name, body in payloads.items():
+        results = []
+        for model in (Data, DataPayload):
+            seconds = timeit.timeit(lambda: model.model_validate_json(body), number=args.number)
+            results.append(seconds / args.number * 1e6)
+        print(
+            f"{name}, {len(body)} bytes: Data {results[0]:.1f} us, "
+            f"DataPayload {results[1]:.1f} us ({results[1] / results[0]:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
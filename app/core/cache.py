@@ -0,0 +1,178 @@
+import gzip
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+from urllib.parse import quote, unquote
+
+from core.settings import CacheSettings
+
+
+# key, first operator and value of a raw query term, ^ < > may be encoded
+QUERY_TERM_REGEX = re.compile(r"^(.*?)((?:\^|%5E|>|%3E|<|%3C)?=|>|%3E|<|%3C)(.*)$", re.IGNORECASE)
+
+
+class WriteGeneration:
+    """
+    Process copy of the data write generation stored in the db
+    (see MongoManager.get_generation), refreshed from the db at most
+    every refresh_interval seconds, so cache hits are served from memory.
+    Writes of this process are seen at once, writes of other replicas
+    and the dump command line tool within refresh_interval.
+    """
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self.value = 0
+        self.refreshed = float("-inf")
+        self.lock = threading.Lock()
+
+    def get(self, mm) -> int:
+        if time.monotonic() - self.refreshed >= self.refresh_interval:
+            value = mm.get_generation()
+            with self.lock:
+                self.value = value
+                self.refreshed = time.monotonic()
+        return self.value
+
+    def bump(self, mm) -> int:
+        value = mm.bump_generation()
+        with self.lock:
+            self.value = value
+            self.refreshed = time.monotonic()
+        return value
+
+
+class CachedResponse(NamedTuple):
+    """
+    Encoded response body with its gzip compressed copy,
+    the copy is only made for cached bodies worth compressing (see ResponseCache.set).
+    """
+    body: bytes
+    headers: Dict[str, str] = {}
+    gzip_body: Optional[bytes] = None
+
+    def compressed(self) -> "CachedResponse":
+        if self.gzip_body is not None or len(self.body) < cache_settings.gzip_minimum_size:
+            return self
+        return self._replace(gzip_body=gzip.compress(self.body, compresslevel=cache_settings.gzip_level))
+
+    def nbytes(self) -> int:
+        return len(self.body) + len(self.gzip_body or b"")
+
+
+class ResponseCache:
+    """
+    LRU cache of pre-encoded response bodies,
+    bounded by number of entries and total size in bytes.
+    Entries are stored with the write generation they were built at
+    (see WriteGeneration) and are treated as misses
+    once the generation moves on or after ttl seconds,
+    the ttl bounds staleness after writes that do not bump the generation.
+    """
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.generation = 0
+        self.entries: OrderedDict = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: str, generation: int) -> Optional[CachedResponse]:
+        with self.lock:
+            self.generation = max(self.generation, generation)
+            entry: Optional[Tuple[int, float, CachedResponse]] = self.entries.get(key)
+            if entry is None or entry[0] != generation or entry[1] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, key: str, generation: int, response: CachedResponse) -> CachedResponse:
+        """
+        Store response built at the given generation, with its gzip copy,
+        callers should read the generation before querying the db.
+        Return the response to send, it is only compressed here if it is stored,
+        otherwise GZipMiddleware compresses it for clients accepting gzip.
+        """
+        if len(response.body) > self.max_bytes or self.max_entries <= 0 or generation < self.generation:
+            return response
+        response = response.compressed()
+        if response.nbytes() > self.max_bytes:
+            return response
+        with self.lock:
+            if generation < self.generation:
+                return response
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (generation, time.monotonic() + self.ttl, response)
+            self.size += response.nbytes()
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+        return response
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+            self.generation = 0
+
+    def stats(self) -> Dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "generation": self.generation,
+            }
+
+    def _remove(self, key: str) -> None:
+        _, _, response = self.entries.pop(key)
+        self.size -= response.nbytes()
+
+
+def normalize_term(term: str) -> str:
+    """
+    Decode operator of the term (the = of it has to be literal)
+    and re-encode key and value, so values may hold any character
+    """
+    match = QUERY_TERM_REGEX.match(term)
+    if match is None:
+        return quote(unquote(term), safe="")
+    key, operator, value = match.groups()
+    return quote(unquote(key), safe="") + unquote(operator) + quote(unquote(value), safe="")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize every query term and sort them,
+    so equivalent queries share a cache key.
+    Terms are split before decoding, so only values are percent-encoded
+    in the result.
+    """
+    return "&".join(sorted(normalize_term(term) for term in query.split("&")))
+
+
+cache_settings = CacheSettings()
+
+data_generation = WriteGeneration(cache_settings.cache_generation_refresh_ms / 1000)
+search_cache = ResponseCache(
+    max_entries=cache_settings.search_cache_max_entries,
+    max_bytes=cache_settings.search_cache_max_bytes,
+    ttl=cache_settings.cache_ttl,
+)
+# Single entry holding the full listing of data
+listing_cache = ResponseCache(
+    max_entries=1,
+    max_bytes=cache_settings.listing_cache_max_bytes,
+    ttl=cache_settings.cache_ttl,
+)
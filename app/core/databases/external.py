@@ -1,5 +1,7 @@
 import logging
+import secrets
 from core.schemas.users import ExternalUser
+from core.passwords import password_hasher
 
 
 log = logging.getLogger()
@@ -8,10 +10,15 @@ log = logging.getLogger()
 EXTERNAL_DB = {
     "testuser": {
         "email": "test@email.domain",
-        "password": "test"
+        # scrypt hash of "test"
+        "password": "scrypt$16384$8$1$cGS6+W/TBPRrt4lG5UwSkA==$DMajJXKSQpcXTVw8ghf7qZLUSDNww1d52ePT886+y8Y="
     }
 }
 
+# Unknown users are checked against this hash of a random password,
+# so they take as long as known users and usernames can not be probed by timing
+DUMMY_PASSWORD_HASH = password_hasher.hash(secrets.token_hex(16))
+
 
 class ExternalDB:
     def __init__(self):
@@ -28,10 +35,10 @@ class ExternalDB:
             log.info(f"User '{username}' not found.")
             return None
 
-    def authenticate_user(self, username, password):
+    async def authenticate_user(self, username, password):
         try:
             user = EXTERNAL_DB[username]
-            if user['password'] == password:
+            if await password_hasher.verify_async(username, password, user['password']):
                 return ExternalUser(
                     login=username,
                     mail=user['email']
@@ -40,5 +47,6 @@ class ExternalDB:
                 log.info("Wrong password.")
                 return None
         except KeyError:
+            await password_hasher.verify_async(username, password, DUMMY_PASSWORD_HASH)
             log.info(f"User '{username}' not found.")
             return None
@@ -1,5 +1,5 @@
 import pymongo
-from typing import Union, List, Dict, Any
+from typing import Union, List, Dict, Any, Iterator
 from core.settings import MongoSettings
 
 
@@ -9,6 +9,27 @@ class MongoManager:
         self.client = pymongo.MongoClient(f"mongodb://{settings.mongo_host}:{settings.mongo_port}/")
         self.db = self.client["api-service"]
         self.data = self.db["data"]
+        self.meta = self.db["meta"]
+
+    def get_generation(self) -> int:
+        """
+        Write generation of the data, shared by all service replicas
+        and the dump command line tool through the db.
+        """
+        doc = self.meta.find_one({"_id": "data"})
+        return doc["generation"] if doc else 0
+
+    def bump_generation(self) -> int:
+        doc = self.meta.find_one_and_update(
+            {"_id": "data"},
+            {"$inc": {"generation": 1}},
+            upsert=True,
+            return_document=pymongo.ReturnDocument.AFTER,
+        )
+        return doc["generation"]
+
+    def create_indexes(self) -> None:
+        self.data.create_index([("name", pymongo.ASCENDING)])
 
     def insert_one(self, d: Dict) -> None:
         self.data.insert_one(d)
@@ -19,11 +40,23 @@ class MongoManager:
     def find_data(self, query: str) -> List[Union[Any, None]]:
         return [d for d in self.data.find(dict((query.split("="),)))]
 
+    def find_by_name(self, query: Dict, limit: int) -> List[Union[Any, None]]:
+        return list(self.data.find(query).sort("name", pymongo.ASCENDING).limit(limit))
+
     def find_all_data(self) -> List[Union[Any, None]]:
         return [doc for doc in self.data.find()]
 
+    def iter_all_data(self, batch_size: int = 1000) -> Iterator[Dict]:
+        return self.data.find({}, {"_id": 0}, batch_size=batch_size)
+
     def replace_one(self, name: str, d: Dict) -> None:
         self.data.replace_one({"name": name}, d)
 
     def delete_one(self, name: str) -> None:
         self.data.delete_one({"name": name})
+
+    def upsert_many(self, docs: List[Dict]) -> None:
+        self.data.bulk_write(
+            [pymongo.ReplaceOne({"name": d["name"]}, d, upsert=True) for d in docs],
+            ordered=False,
+        )
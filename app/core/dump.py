@@ -0,0 +1,132 @@
+import gzip
+import hashlib
+import zlib
+from typing import BinaryIO, Iterator, List, Optional
+
+from pydantic import ValidationError
+
+from core.cache import data_generation
+from core.databases.mongo import MongoManager
+from core.schemas.data import Data
+from core.schemas.dump import DumpChecksum, DumpFooter, ImportResult
+from core.settings import DumpSettings
+
+
+class DumpError(Exception):
+    """
+    Raised when a dump can not be imported,
+    offset is the number of records already loaded to the db
+    or None if the dump is rejected as a whole
+    """
+    def __init__(self, message: str, offset: Optional[int]):
+        super().__init__(message)
+        self.offset = offset
+
+
+def export_dump(mm: MongoManager, settings: DumpSettings) -> Iterator[bytes]:
+    """
+    Stream the data collection as gzip compressed NDJSON, one record per line.
+    The last line is a footer with sha256 of the uncompressed records and their count.
+    Documents are read from the cursor in batches and never held all in memory.
+    """
+    compressor = zlib.compressobj(wbits=31)
+    checksum = hashlib.sha256()
+    count = 0
+    buffer = bytearray()
+    for doc in mm.iter_all_data(batch_size=settings.dump_batch_size):
+        line = Data(**doc).model_dump_json().encode() + b"\n"
+        checksum.update(line)
+        count += 1
+        buffer += line
+        if len(buffer) >= settings.dump_chunk_size:
+            chunk = compressor.compress(bytes(buffer))
+            buffer.clear()
+            if chunk:
+                yield chunk
+    footer = DumpFooter(checksum=DumpChecksum(sha256=checksum.hexdigest(), count=count))
+    buffer += footer.model_dump_json().encode() + b"\n"
+    yield compressor.compress(bytes(buffer)) + compressor.flush()
+
+
+def verify_dump(fileobj: BinaryIO) -> int:
+    """
+    Read the whole dump and check it against its checksum line,
+    return the number of records. Dumps without the checksum line are incomplete
+    and are rejected.
+    """
+    checksum = hashlib.sha256()
+    count = 0
+    footer = None
+    try:
+        with gzip.open(fileobj, "rb") as lines:
+            for line in lines:
+                if footer is not None:
+                    raise DumpError("Dump has data after the checksum line", None)
+                if line.startswith(b'{"checksum"'):
+                    footer = DumpFooter.model_validate_json(line)
+                    continue
+                checksum.update(line)
+                count += 1
+    except (OSError, EOFError, zlib.error, ValidationError) as e:
+        raise DumpError(f"Dump is corrupted: {e}", None)
+    if footer is None:
+        raise DumpError("Dump has no checksum line, it is incomplete", None)
+    if footer.checksum.count != count or footer.checksum.sha256 != checksum.hexdigest():
+        raise DumpError("Dump checksum does not match", None)
+    return count
+
+
+def import_dump(
+    mm: MongoManager,
+    fileobj: BinaryIO,
+    settings: DumpSettings,
+    offset: int = 0,
+) -> ImportResult:
+    """
+    Load a dump made by export_dump, fileobj must be seekable.
+    The dump is verified with verify_dump first, so nothing is written
+    from a truncated or altered dump, then it is read again line by line.
+    Records are validated against Data and upserted by name in unordered
+    bulk writes, so loading the same records twice is harmless.
+    Metadata limits of the data routes are not applied,
+    so data stored before the limits can be restored.
+    First `offset` records are skipped to resume an interrupted import.
+    """
+    total = verify_dump(fileobj)
+    fileobj.seek(0)
+
+    count = 0
+    imported = 0
+    batch: List[dict] = []
+
+    def flush():
+        nonlocal imported
+        if not batch:
+            return
+        try:
+            mm.upsert_many(batch)
+        except Exception as e:
+            raise DumpError(f"Failed to save records to db: {e}", offset + imported)
+        finally:
+            data_generation.bump(mm)
+        imported += len(batch)
+        batch.clear()
+
+    with gzip.open(fileobj, "rb") as lines:
+        for line in lines:
+            if count == total:
+                break
+            count += 1
+            if count <= offset:
+                continue
+            try:
+                data = Data.model_validate_json(line)
+            except ValidationError as e:
+                flush()
+                raise DumpError(f"Record {count} is invalid: {e}", offset + imported)
+            batch.append(data.model_dump())
+            if len(batch) >= settings.dump_batch_size:
+                flush()
+    flush()
+
+    return ImportResult(imported=imported, offset=count, checksum_verified=True)
@@ -0,0 +1,119 @@
+import asyncio
+import base64
+import binascii
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from core.settings import PasswordSettings
+
+
+class PasswordHasher:
+    """
+    Hash and verify passwords with scrypt.
+    Hashes are stored as 'scrypt$n$r$p$salt$hash' (salt and hash base64 encoded),
+    so cost parameters can be raised without invalidating existing hashes.
+    Verification runs in a bounded thread pool (hashlib.scrypt releases the GIL),
+    recently verified pairs are kept in a short-lived in-memory cache.
+    """
+    def __init__(self, settings: PasswordSettings):
+        self.settings = settings
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.password_workers,
+            thread_name_prefix="password",
+        )
+        # Cache keys are keyed HMACs of the password, plain passwords are never kept.
+        self.cache_key = secrets.token_bytes(32)
+        self.cache: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+
+    def hash(self, password: str) -> str:
+        salt = secrets.token_bytes(16)
+        n, r, p = self.settings.scrypt_n, self.settings.scrypt_r, self.settings.scrypt_p
+        digest = self._scrypt(password, salt, n, r, p)
+        return "$".join([
+            "scrypt", str(n), str(r), str(p),
+            base64.b64encode(salt).decode(),
+            base64.b64encode(digest).decode(),
+        ])
+
+    def verify(self, password: str, encoded: str) -> bool:
+        """
+        Check password against encoded hash, this is CPU bound
+        and should not be called from the event loop.
+        """
+        try:
+            scheme, n, r, p, salt, digest = encoded.split("$")
+            if scheme != "scrypt":
+                return False
+            expected = base64.b64decode(digest, validate=True)
+            actual = self._scrypt(
+                password,
+                base64.b64decode(salt, validate=True),
+                int(n), int(r), int(p),
+                len(expected),
+            )
+        except (ValueError, binascii.Error):
+            # malformed hash or invalid scrypt parameters
+            return False
+        return hmac.compare_digest(actual, expected)
+
+    async def verify_async(self, username: str, password: str, encoded: str) -> bool:
+        """
+        Check the cache first, then run verification in the worker pool.
+        Only successful verifications are cached.
+        """
+        key = self._cache_key(username, password, encoded)
+        if self._cache_get(key):
+            return True
+        loop = asyncio.get_running_loop()
+        verified = await loop.run_in_executor(self.executor, self.verify, password, encoded)
+        if verified:
+            self._cache_set(key)
+        return verified
+
+    def clear_cache(self) -> None:
+        with self.lock:
+            self.cache.clear()
+
+    def _scrypt(self, password: str, salt: bytes, n: int, r: int, p: int, dklen: int = 32) -> bytes:
+        return hashlib.scrypt(
+            password.encode(),
+            salt=salt,
+            n=n,
+            r=r,
+            p=p,
+            maxmem=2 * 128 * n * r * p,
+            dklen=dklen,
+        )
+
+    def _cache_key(self, username: str, password: str, encoded: str) -> bytes:
+        # Stored hash is a part of the key, so a password change invalidates the entry.
+        message = "\0".join([username, encoded, password]).encode()
+        return hmac.new(self.cache_key, message, hashlib.sha256).digest()
+
+    def _cache_get(self, key: bytes) -> bool:
+        with self.lock:
+            expires = self.cache.get(key)
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self.cache[key]
+                return False
+            return True
+
+    def _cache_set(self, key: bytes) -> None:
+        if self.settings.password_cache_size <= 0:
+            return
+        with self.lock:
+            self.cache[key] = time.monotonic() + self.settings.password_cache_ttl
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.settings.password_cache_size:
+                self.cache.popitem(last=False)
+
+
+password_hasher = PasswordHasher(PasswordSettings())
@@ -1,9 +1,17 @@
-from pydantic import BaseModel
-from typing import Dict
-from pydantic import constr
+import re
+from urllib.parse import unquote
+from pydantic import BaseModel, field_validator
+from typing import Dict, List, Optional
+from pydantic import conint, constr, TypeAdapter
+from core.settings import MetadataSettings
 
 
 QUERY_REGEX = r"^(?:name|metadata)(?:\.[a-zA-Z0-9-]+)*=[a-zA-Z0-9-]+$"
+# Same as a path segment of QUERY_REGEX, so every stored key can be searched
+METADATA_KEY_REGEX = re.compile(r"[a-zA-Z0-9-]+")
+NAME_TERM_REGEX = re.compile(r"^name(\^=|>=|<=|>|<)(.*)$")
+NAME_QUERY_DEFAULT_LIMIT = 100
+NAME_QUERY_MAX_LIMIT = 1000
 
 
 class Data(BaseModel):
@@ -15,8 +23,146 @@ class Data(BaseModel):
     metadata: Dict
 
 
+metadata_settings = MetadataSettings()
+
+
+def check_metadata(metadata: Dict, settings: MetadataSettings) -> None:
+    """
+    Walk metadata once and check depth, total keys (list items included),
+    key length and charset, and string value size.
+    Raise ValueError on the first limit exceeded.
+    """
+    max_depth = settings.metadata_max_depth
+    max_keys = settings.metadata_max_keys
+    max_key_length = settings.metadata_max_key_length
+    max_value_size = settings.metadata_max_value_size
+    key_match = METADATA_KEY_REGEX.fullmatch
+    keys = 0
+    stack = [(metadata, 1)]
+    while stack:
+        node, depth = stack.pop()
+        if depth > max_depth:
+            raise ValueError(f"metadata is nested deeper than {max_depth} levels")
+        keys += len(node)
+        if keys > max_keys:
+            raise ValueError(f"metadata has more than {max_keys} keys")
+        if isinstance(node, dict):
+            for key in node:
+                if len(key) > max_key_length:
+                    raise ValueError(f"metadata key is longer than {max_key_length} characters")
+                if key_match(key) is None:
+                    raise ValueError(f"metadata key '{key}' has characters other than a-z, A-Z, 0-9, -")
+            values = node.values()
+        else:
+            values = node
+        for value in values:
+            if type(value) is str:
+                if len(value) > max_value_size:
+                    raise ValueError(f"metadata value is longer than {max_value_size} characters")
+            elif isinstance(value, (dict, list)):
+                stack.append((value, depth + 1))
+
+
+class DataPayload(Data):
+    """
+    Data model for incoming data,
+    metadata is checked against size limits
+    """
+
+    @field_validator("metadata")
+    @classmethod
+    def metadata_limits(cls, metadata: Dict) -> Dict:
+        check_metadata(metadata, metadata_settings)
+        return metadata
+
+
 class DataQuery(BaseModel):
     """
     Model for query validation
     """
     query: constr(pattern=QUERY_REGEX)
+
+
+# Any name can be stored, so bounds are any non-empty (percent-decoded) string
+NameValue = constr(min_length=1)
+
+
+def prefix_end(prefix: str) -> Optional[str]:
+    """
+    Smallest string greater than all strings starting with prefix,
+    in code point order (same as mongo's binary order of UTF-8 strings).
+    Return None if there is no such string.
+    """
+    prefix = prefix.rstrip(chr(0x10FFFF))
+    if not prefix:
+        return None
+    last = ord(prefix[-1]) + 1
+    if 0xD800 <= last <= 0xDFFF:
+        # surrogates can not be encoded to UTF-8, skip them
+        last = 0xE000
+    return prefix[:-1] + chr(last)
+
+
+class NameQuery(BaseModel):
+    """
+    Model for prefix and range queries on name, i.e.
+    name^=data-&limit=10 or name>=data-1&name<data-5&after=data-2.
+    Results are sorted by name, after is the last name of the previous page.
+    Values are percent-decoded, so any name can be used as a bound.
+    """
+    prefix: Optional[NameValue] = None
+    gt: Optional[NameValue] = None
+    gte: Optional[NameValue] = None
+    lt: Optional[NameValue] = None
+    lte: Optional[NameValue] = None
+    after: Optional[NameValue] = None
+    limit: conint(ge=1, le=NAME_QUERY_MAX_LIMIT) = NAME_QUERY_DEFAULT_LIMIT
+
+    @staticmethod
+    def matches(query: str) -> bool:
+        return any(NAME_TERM_REGEX.match(term) for term in query.split("&"))
+
+    @classmethod
+    def from_query(cls, query: str) -> "NameQuery":
+        """
+        Parse query string (terms percent-encoded, see normalize_query),
+        raise ValueError if it is malformed
+        """
+        operators = {"^=": "prefix", ">": "gt", ">=": "gte", "<": "lt", "<=": "lte"}
+        fields = {}
+        for term in query.split("&"):
+            match = NAME_TERM_REGEX.match(term)
+            if match:
+                field, value = operators[match.group(1)], match.group(2)
+            elif term.startswith(("after=", "limit=")):
+                field, value = term.split("=", 1)
+            else:
+                raise ValueError(f"Unexpected query term: {term}")
+            if field in fields:
+                raise ValueError(f"Duplicate query term: {term}")
+            fields[field] = unquote(value)
+        return cls(**fields)
+
+    def to_filter(self) -> Dict:
+        """
+        Compile to a range on name, so mongo can answer it with an index scan.
+        Prefix is turned into [prefix, next prefix) range.
+        """
+        lower = [(v, "$gte") for v in (self.gte, self.prefix) if v is not None]
+        lower += [(v, "$gt") for v in (self.gt, self.after) if v is not None]
+        upper = [(v, "$lte") for v in (self.lte,) if v is not None]
+        upper += [(v, "$lt") for v in (self.lt, self.prefix and prefix_end(self.prefix)) if v is not None]
+
+        bounds = {}
+        if lower:
+            # the highest bound wins, $gt is stricter than $gte on a tie
+            value, op = max(lower, key=lambda b: (b[0], b[1] == "$gt"))
+            bounds[op] = value
+        if upper:
+            value, op = min(upper, key=lambda b: (b[0], b[1] == "$lte"))
+            bounds[op] = value
+        return {"name": bounds} if bounds else {}
+
+
+# Used to encode lists of data without going through response_model
+DataList = TypeAdapter(List[Data])
@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+
+
+class DumpChecksum(BaseModel):
+    sha256: str
+    count: int
+
+
+class DumpFooter(BaseModel):
+    """
+    Last line of a dump, lines before it are data records
+    """
+    checksum: DumpChecksum
+
+
+class ImportResult(BaseModel):
+    """
+    Result of a dump import,
+    offset is the number of records processed (pass it to resume)
+    """
+    imported: int
+    offset: int
+    checksum_verified: bool
@@ -18,3 +18,47 @@ class SecuritySettings(BaseSettings):
     api_key_name: str = "X-API-KEY"
     basic_password: str
     basic_username: str = "x-admin-user"
+
+
+class PasswordSettings(BaseSettings):
+    password_workers: int = 2
+    password_cache_ttl: int = 60
+    password_cache_size: int = 1024
+    scrypt_n: int = 16384
+    scrypt_r: int = 8
+    scrypt_p: int = 1
+
+
+class CacheSettings(BaseSettings):
+    search_cache_max_entries: int = 256
+    search_cache_max_bytes: int = 8 * 1024 * 1024
+    listing_cache_max_bytes: int = 16 * 1024 * 1024
+    cache_ttl: int = 60
+    cache_generation_refresh_ms: int = 500
+    gzip_minimum_size: int = 500
+    gzip_level: int = 6
+
+
+class ProfileSettings(BaseSettings):
+    profile_sample_rate: float = 0.0
+    profile_top_n: int = 20
+    profile_store_size: int = 16
+
+
+class DumpSettings(BaseSettings):
+    dump_batch_size: int = 1000
+    dump_chunk_size: int = 64 * 1024
+
+
+class TracingSettings(BaseSettings):
+    trace_sample_rate: float = 0.0
+    trace_exporter: str = "stdout"
+    trace_file: str = "traces.ndjson"
+
+
+class MetadataSettings(BaseSettings):
+    metadata_max_depth: int = 16
+    metadata_max_keys: int = 1000
+    metadata_max_key_length: int = 64
+    metadata_max_value_size: int = 4096
+    data_max_body_size: int = 256 * 1024
@@ -10,10 +10,11 @@ from fastapi.requests import Request
 from jose import jwt, JWTError
 import secrets
 
-from core.schemas.users import User
+from core.schemas.users import User, ExternalUser
 from core.settings import SecuritySettings
 from core.schemas.auth import TokenData
 from core.databases.external import ExternalDB
+from utils.tracing import tracer
 
 
 class OAuth2PasswordBearerHeaderOrCookie(OAuth2):
@@ -84,21 +85,22 @@ def get_external_user(token: str = Depends(oauth2_scheme)):
     """
     if not token:
         return None
-    try:
-        payload = jwt.decode(
-            token,
-            sec_settings.secret_key,
-            algorithms=[sec_settings.algorith]
-        )
-        username: str = payload.get("sub")
-        if username is None:
+    with tracer.span("auth.bearer"):
+        try:
+            payload = jwt.decode(
+                token,
+                sec_settings.secret_key,
+                algorithms=[sec_settings.algorith]
+            )
+            username: str = payload.get("sub")
+            if username is None:
+                return None
+            token_data = TokenData(username=username)
+        except JWTError:
             return None
-        token_data = TokenData(username=username)
-    except JWTError:
-        return None
-    ext_db = ExternalDB()
-    user = ext_db.get_user(token_data.username)
-    return user
+        ext_db = ExternalDB()
+        user = ext_db.get_user(token_data.username)
+        return user
 
 
 async def get_api_key_user(api_key_header: str = Security(api_key_header)):
@@ -109,10 +111,11 @@ async def get_api_key_user(api_key_header: str = Security(api_key_header)):
     """
     if not api_key_header:
         return None
-    correct_apikey = secrets.compare_digest(api_key_header, sec_settings.api_key)
-    if not correct_apikey:
-        return None
-    return User(login=sec_settings.api_key_name.lower())
+    with tracer.span("auth.apikey"):
+        correct_apikey = secrets.compare_digest(api_key_header, sec_settings.api_key)
+        if not correct_apikey:
+            return None
+        return User(login=sec_settings.api_key_name.lower())
 
 
 async def get_http_basic_user(credentials: HTTPBasicCredentials = Depends(basic)):
@@ -123,17 +126,18 @@ async def get_http_basic_user(credentials: HTTPBasicCredentials = Depends(basic)
     """
     if not credentials:
         return None
-    correct_username = secrets.compare_digest(
-        credentials.username,
-        sec_settings.basic_username
-    )
-    correct_password = secrets.compare_digest(
-        credentials.password,
-        sec_settings.basic_password
-    )
-    if not (correct_username and correct_password):
-        return None
-    return User(login=sec_settings.basic_username.lower())
+    with tracer.span("auth.basic"):
+        correct_username = secrets.compare_digest(
+            credentials.username,
+            sec_settings.basic_username
+        )
+        correct_password = secrets.compare_digest(
+            credentials.password,
+            sec_settings.basic_password
+        )
+        if not (correct_username and correct_password):
+            return None
+        return User(login=sec_settings.basic_username.lower())
 
 
 async def auth_check(
@@ -159,3 +163,32 @@ async def auth_check(
     if external_user:
         return external_user
     raise credentials_exception
+
+
+async def admin_check(user: User = Depends(auth_check)):
+    """
+    Resolve auth dependencies and check the user is an admin.
+    Only apikey and basic users are admins, bearer token users are not.
+    Return 403 for non-admin users.
+    """
+    if isinstance(user, ExternalUser):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required",
+        )
+    return user
+
+
+async def get_admin_user(request: Request) -> Optional[User]:
+    """
+    Same as admin_check but resolves credentials from the request directly,
+    for use outside of routes (i.e. in middlewares).
+    Return None if the request is not made by an admin.
+    """
+    apikey_user = await get_api_key_user(await api_key_header(request))
+    try:
+        credentials = await basic(request)
+    except HTTPException:
+        credentials = None
+    basic_user = await get_http_basic_user(credentials)
+    return apikey_user or basic_user
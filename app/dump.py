@@ -0,0 +1,66 @@
+"""
+Export and import the data collection without going through the API.
+
+    python dump.py export data.ndjson.gz
+    python dump.py import data.ndjson.gz [--offset N]
+"""
+import argparse
+import logging.config
+import shutil
+import sys
+import tempfile
+
+from utils.logger import LOGGING_CONFIG
+from core.databases.mongo import MongoManager
+from core.dump import DumpError, export_dump, import_dump
+from core.settings import DumpSettings
+
+
+logging.config.dictConfig(LOGGING_CONFIG)
+
+
+log = logging.getLogger()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="dump data to a file (- for stdout)")
+    export_parser.add_argument("file")
+    import_parser = subparsers.add_parser("import", help="load data from a file (- for stdin)")
+    import_parser.add_argument("file")
+    import_parser.add_argument("--offset", type=int, default=0, help="records to skip to resume an import")
+    args = parser.parse_args()
+
+    mm = MongoManager()
+    settings = DumpSettings()
+
+    if args.command == "export":
+        out = sys.stdout.buffer if args.file == "-" else open(args.file, "wb")
+        with out:
+            for chunk in export_dump(mm, settings):
+                out.write(chunk)
+        log.info(f"Data exported to {args.file}")
+        return
+
+    if args.file == "-":
+        # dump is read twice (verify, then load), so stdin is spooled to a file
+        src = tempfile.TemporaryFile()
+        shutil.copyfileobj(sys.stdin.buffer, src)
+        src.seek(0)
+    else:
+        src = open(args.file, "rb")
+    with src:
+        try:
+            result = import_dump(mm, src, settings, args.offset)
+        except DumpError as e:
+            if e.offset is None:
+                log.error(f"Failed to import dump: {e}")
+            else:
+                log.error(f"Failed to import dump: {e}, resume with --offset {e.offset}")
+            sys.exit(1)
+    log.info(f"Imported {result.imported} records")
+
+
+if __name__ == "__main__":
+    main()
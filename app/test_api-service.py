@@ -1,13 +1,22 @@
 import sys
 import os
 import mongomock
+import pytest
 from fastapi.testclient import TestClient
 from importlib import import_module
+from urllib.parse import quote
 
 
 sys.path.append(os.path.dirname(__file__))
 
 
+# pymongo>=4.11 passes sort to bulk replace, which mongomock does not accept yet
+_add_replace = mongomock.collection.BulkOperationBuilder.add_replace
+mongomock.collection.BulkOperationBuilder.add_replace = (
+    lambda self, selector, doc, upsert, sort=None, **kwargs: _add_replace(self, selector, doc, upsert, **kwargs)
+)
+
+
 API_KEY = os.getenv("API_KEY")
 
 
@@ -20,6 +29,15 @@ app = import_module("api-service").app
 client = TestClient(app)
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # every test starts with an empty mocked db, cached responses are stale
+    from core.cache import data_generation, listing_cache, search_cache
+    listing_cache.clear()
+    search_cache.clear()
+    data_generation.refreshed = float("-inf")
+
+
 # GET /api/v1/data
 
 @mongomock.patch(servers=(('localhost', 27017),))
@@ -210,3 +228,545 @@ def test_search_data():
     response = client.get("/api/v1/search?metadata.property-1.enabled=true")
     assert response.status_code == 200
     assert response.json() == [data1, data2]
+
+
+# POST /api/v1/auth/tokens
+
+def test_get_token():
+    response = client.post(
+        "/api/v1/auth/tokens",
+        data={"username": "testuser", "password": "test"},
+    )
+    assert response.status_code == 200
+    assert response.json()["token_type"] == "bearer"
+
+
+def test_get_token_wrong_password():
+    response = client.post(
+        "/api/v1/auth/tokens",
+        data={"username": "testuser", "password": "wrong"},
+    )
+    assert response.status_code == 401
+
+
+def test_get_token_unknown_user_verifies_dummy_hash():
+    from core.databases.external import DUMMY_PASSWORD_HASH
+    from core.passwords import password_hasher
+
+    checked = []
+    verify = password_hasher.verify
+    password_hasher.verify = lambda password, encoded: checked.append(encoded) or verify(password, encoded)
+    try:
+        response = client.post(
+            "/api/v1/auth/tokens",
+            data={"username": "unknownuser", "password": "test"},
+        )
+    finally:
+        password_hasher.verify = verify
+    assert response.status_code == 401
+    assert checked == [DUMMY_PASSWORD_HASH]
+
+
+def test_password_hash_verify():
+    from core.passwords import password_hasher
+
+    encoded = password_hasher.hash("secret")
+    assert encoded.startswith("scrypt$")
+    assert password_hasher.verify("secret", encoded)
+    assert not password_hasher.verify("wrong", encoded)
+
+
+def test_password_verify_malformed_hash():
+    from core.passwords import password_hasher
+
+    for encoded in [
+        "plain",
+        "bcrypt$16384$8$1$c2FsdA==$ZGlnZXN0",
+        "scrypt$abc$8$1$c2FsdA==$ZGlnZXN0",
+        "scrypt$16384$8$1$not*base64$ZGlnZXN0",
+        "scrypt$16384$8$1$c2FsdA==$ZGln",
+        "scrypt$1000$8$1$c2FsdA==$ZGlnZXN0",
+    ]:
+        assert not password_hasher.verify("test", encoded)
+
+
+def test_get_token_malformed_stored_hash():
+    from core.databases.external import EXTERNAL_DB
+
+    EXTERNAL_DB["brokenuser"] = {"email": "broken@email.domain", "password": "scrypt$x$8$1$!!$!!"}
+    try:
+        response = client.post(
+            "/api/v1/auth/tokens",
+            data={"username": "brokenuser", "password": "test"},
+        )
+    finally:
+        del EXTERNAL_DB["brokenuser"]
+    assert response.status_code == 401
+
+
+@mongomock.patch(servers=(('localhost', 27017),))
+def test_search_cache():
+    client.post(
+        "/api/v1/data",
+        headers={"Content-Type": "application/json", "X-API-KEY": API_KEY},
+        json=data1
+    )
+
+    hits = client.get("/api/v1/search/cache").json()["hits"]
+    for _ in range(2):
+        response = client.get("/api/v1/search?metadata.property-1.enabled=true")
+        assert response.json() == [data1]
+    assert client.get("/api/v1/search/cache").json()["hits"] == hits + 1
+
+    client.post(
+        "/api/v1/data",
+        headers={"Content-Type": "application/json", "X-API-KEY": API_KEY},
+        json=data2
+    )
+    response = client.get("/api/v1/search?metadata.property-1.enabled=true")
+    assert response.json() == [data1, data2]
+
+
+# GET /api/v1/profiles/{profile_id}
+
+@mongomock.patch(servers=(('localhost', 27017),))
+def test_profile_request():
+    response = client.get("/api/v1/data", headers={"X-Profile": "tottime", "X-API-KEY": API_KEY})
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+    assert profile_id in response.headers["Link"]
+
+    client.cookies.clear()
+    response = client.get(f"/api/v1/profiles/{profile_id}")
+    assert response.status_code == 401
+
+    response = client.get(f"/api/v1/profiles/{profile_id}", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200
+    assert "function calls" in response.text
+
+
+@mongomock.patch(servers=(('localhost', 27017),))
+def test_profile_request_non_admin():
+    response = client.get("/api/v1/data", headers={"X-Profile": "tottime"})
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+
+    response = client.get("/api/v1/profiles/fake-profile", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 404
+
+
+# GET /api/v1/admin/export, POST /api/v1/admin/import
+
+@mongomock.patch(servers=(('localhost', 27017),))
+def test_export_import_data():
+    for data in [data1, data2, data3]:
+        client.post(
+            "/api/v1/data",
+            headers={"Content-Type": "application/json", "X-API-KEY": API_KEY},
+            json=data
+        )
+
+    response = client.get("/api/v1/admin/export", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200
+    dump = response.content
+
+    for data in [data1, data2, data3]:
+        client.delete(f"/api/v1/data/{data['name']}", headers={"X-API-KEY": API_KEY})
+
+    response = client.post(
+        "/api/v1/admin/import?offset=1",
+        headers={"X-API-KEY": API_KEY},
+        files={"dump": ("data.ndjson.gz", dump)},
+    )
+    assert response.status_code == 200
+    assert response.json() == {"imported": 2, "offset": 3, "checksum_verified": True}
+    assert client.get("/api/v1/data").json() == [data2, data3]
+
+
+def make_dump(records, checksum=True):
+    import gzip
+    import hashlib
+    import json
+
+    lines = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records).encode()
+    if checksum:
+        footer = {"checksum": {"sha256": hashlib.sha256(lines).hexdigest(), "count": len(records)}}
+        lines += json.dumps(footer).encode() + b"\n"
+    return gzip.compress(lines)
+
+
+@mongomock.patch(servers=(('localhost', 27017),))
+def test_import_invalid_data():
+    dump = make_dump([data1, {"name": "data-2"}])
+    response = client.post(
+        "/api/v1/admin/import",
+        headers={"X-API-KEY": API_KEY},
+        files={"dump": ("data.ndjson.gz", dump)},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"]["offset"] == 1
+    assert client.get("/api/v1/data").json() == [data1]
+
+
+@mongomock.patch(servers=(('localhost', 27017),))
+def test_import_db_failure():
+    from core.databases.mongo import MongoManager
+
+    def fail(self, docs):
+        raise Exception("db is down")
+
+    upsert_many = MongoManager.upsert_many
+    MongoManager.upsert_many = fail
+    try:
+        response = client.post(
+            "/api/v1/admin/import?offset=1",
+            headers={"X-API-KEY": API_KEY},
+            files={"dump": ("data.ndjson.gz", make_dump([data1, data2, data3, {"name": "data-4"}]))},
+        )
+    finally:
+        MongoManager.upsert_many = upsert_many
+    assert response.status_code == 400
+    assert response.json()["detail"]["offset"] == 1
+
+
+@mongomock.patch(servers=(('localhost', 27017),))
+def test_import_altered_dump():
+    import gzip
+
+    lines = gzip.decompress(make_dump([data1, data2])).replace(b"data-2", b"data-9")
+    response = client.post(
+        "/api/v1/admin/import",
+        headers={"X-API-KEY": API_KEY},
+        files={"dump": ("data.ndjson.gz", gzip.compress(lines))},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"]["offset"] is None
+    assert client.get("/api/v1/data").json() == []
+
+
+@mongomock.patch(servers=(('localhost', 27017),))
+def test_import_dump_without_checksum():
+    response = client.post(
+        "/api/v1/admin/import",
+        headers={"X-API-KEY": API_KEY},
+        files={"dump": ("data.ndjson.gz", make_dump([data1, data2], checksum=False))},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"]["offset"] is None
+    assert client.get("/api/v1/data").json() == []
+
+
+@mongomock.patch(servers=(('localhost', 27017),))
+def test_export_import_data_over_metadata_limits():
+    from core.databases.mongo import MongoManager
+
+    # stored before metadata limits, can not be created with POST now
+    legacy = {"name": "data-legacy", "metadata": {"a_b": "value"}}
+    MongoManager().insert_one(dict(legacy))
+
+    dump = client.get("/api/v1/admin/export", headers={"X-API-KEY": API_KEY}).content
+    client.delete(f"/api/v1/data/{legacy['name']}", headers={"X-API-KEY": API_KEY})
+
+    response = client.post(
+        "/api/v1/admin/import",
+        headers={"X-API-KEY": API_KEY},
+        files={"dump": ("data.ndjson.gz", dump)},
+    )
+    assert response.status_code == 200
+    assert response.json()["imported"] == 1
+    assert client.get("/api/v1/data").json() == [legacy]
+
+
+# Tracing
+
+@mongomock.patch(servers=(('localhost', 27017),))
+def test_traceparent_propagation():
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    response = client.get(
+        "/api/v1/search?metadata.property-1.enabled=true",
+        headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-00"},
+    )
+    assert response.status_code == 200
+    assert response.headers["traceparent"].startswith(f"00-{trace_id}-")
+    assert response.headers["traceparent"].endswith("-00")
+
+
+def test_trace_spans():
+    import json
+    from core.settings import TracingSettings
+    from utils.tracing import Exporter, Tracer
+
+    settings = TracingSettings(trace_sample_rate=1.0)
+    exporter = Exporter(settings)
+    exported = []
+    exporter.export = lambda span: exported.append(json.loads(json.dumps(span.to_dict())))
+    tracer = Tracer(settings, exporter)
+
+    root = tracer.start_trace("request")
+    token = tracer.current.set(root)
+    with tracer.span("child", key="value"):
+        pass
+    tracer.current.reset(token)
+    tracer.finish(root)
+
+    child, request = exported
+    assert child["name"] == "child" and child["attributes"] == {"key": "value"}
+    assert child["parent_id"] == request["span_id"]
+    assert child["trace_id"] == request["trace_id"]
+
+
+@mongomock.patch(servers=(('localhost', 27017),))
+def test_search_name_prefix():
+    for data in [data1, data2, data3]:
+        client.post(
+            "/api/v1/data",
+            headers={"Content-Type": "application/json", "X-API-KEY": API_KEY},
+            json=data
+        )
+
+    response = client.get("/api/v1/search?name^=data-")
+    assert response.status_code == 200
+    assert response.json() == [data1, data2, data3]
+    assert "X-Next-After" not in response.headers
+
+    response = client.get("/api/v1/search?name^=data-&limit=2")
+    assert response.json() == [data1, data2]
+    assert response.headers["X-Next-After"] == "data-2"
+
+    response = client.get("/api/v1/search?name^=data-&limit=2&after=data-2")
+    assert response.json() == [data3]
+    assert "X-Next-After" not in response.headers
+
+    response = client.get("/api/v1/search?name^=other")
+    assert response.json() == []
+
+
+@mongomock.patch(servers=(('localhost', 27017),))
+def test_search_name_range():
+    for data in [data1, data2, data3]:
+        client.post(
+            "/api/v1/data",
+            headers={"Content-Type": "application/json", "X-API-KEY": API_KEY},
+            json=data
+        )
+
+    response = client.get("/api/v1/search?name>data-1&name<=data-3")
+    assert response.json() == [data2, data3]
+
+    response = client.get("/api/v1/search?name>=data-1&name<data-3")
+    assert response.json() == [data1, data2]
+
+
+@mongomock.patch(servers=(('localhost', 27017),))
+def test_search_name_invalid_query():
+    for query in ["name^=", "name^=a&name^=b", "name^=a&limit=0", "name^=a&metadata.x=y"]:
+        response = client.get(f"/api/v1/search?{query}")
+        assert response.status_code == 400
+
+
+@mongomock.patch(servers=(('localhost', 27017),))
+def test_search_name_any_characters():
+    names = ["data&1", "data_1", "data_2", "data_3", "dataЖ1"]
+    for name in names:
+        client.post(
+            "/api/v1/data",
+            headers={"Content-Type": "application/json", "X-API-KEY": API_KEY},
+            json={"name": name, "metadata": {}}
+        )
+
+    found, after = [], None
+    while True:
+        query = "name^=data&limit=2" + (f"&after={after}" if after else "")
+        response = client.get(f"/api/v1/search?{query}")
+        assert response.status_code == 200
+        found += [data["name"] for data in response.json()]
+        after = response.headers.get("X-Next-After")
+        if after is None:
+            break
+    assert found == names
+
+    response = client.get(f"/api/v1/search?name>{quote('data_1')}&name<{quote('dataЖ1')}")
+    assert [data["name"] for data in response.json()] == ["data_2", "data_3"]
+
+    response = client.get(f"/api/v1/search?name^={quote('data&', safe='')}")
+    assert [data["name"] for data in response.json()] == ["data&1"]
+
+
+def test_name_query_filter():
+    from core.cache import normalize_query
+    from core.schemas.data import NameQuery
+
+    assert NameQuery.from_query("name^=data-").to_filter() == {"name": {"$gte": "data-", "$lt": "data."}}
+    assert NameQuery.from_query("name^=data-&name>=data-5&after=data-7&limit=5").to_filter() == {"name": {"$gt": "data-7", "$lt": "data."}}
+    assert NameQuery.from_query("name<z&name<=b").to_filter() == {"name": {"$lte": "b"}}
+    assert NameQuery.from_query("name^=a%F4%8F%BF%BF").to_filter() == {"name": {"$gte": "a\U0010ffff", "$lt": "b"}}
+    assert NameQuery.from_query("name^=%F4%8F%BF%BF").to_filter() == {"name": {"$gte": "\U0010ffff"}}
+    assert NameQuery.from_query("name^=a%ED%9F%BF").to_filter() == {"name": {"$gte": "a\ud7ff", "$lt": "a\ue000"}}
+
+    assert NameQuery.from_query(normalize_query("name%3E%3Dx")).gt == "=x"
+    assert NameQuery.from_query(normalize_query("name%3E=x")).gte == "x"
+
+
+# Compression
+
+@mongomock.patch(servers=(('localhost', 27017),))
+def test_get_full_db_compressed():
+    datas = [{"name": f"data-{i}", "metadata": data1["metadata"]} for i in range(10)]
+    for data in datas:
+        client.post(
+            "/api/v1/data",
+            headers={"Content-Type": "application/json", "X-API-KEY": API_KEY},
+            json=data
+        )
+
+    for _ in range(2):
+        response = client.get("/api/v1/data", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.json() == datas
+
+    response = client.get("/api/v1/data", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in response.headers
+    assert response.json() == datas
+
+    client.delete("/api/v1/data/data-0", headers={"X-API-KEY": API_KEY})
+    response = client.get("/api/v1/data", headers={"Accept-Encoding": "gzip"})
+    assert response.json() == datas[1:]
+
+
+def test_cache_compresses_stored_responses_only():
+    import gzip
+    from core.cache import CachedResponse, ResponseCache
+
+    body = b"[]" * 1000
+    response = ResponseCache(max_entries=1, max_bytes=len(body) * 2, ttl=60).set("key", 0, CachedResponse(body))
+    assert gzip.decompress(response.gzip_body) == body
+
+    for cache in [
+        ResponseCache(max_entries=0, max_bytes=len(body) * 2, ttl=60),
+        ResponseCache(max_entries=1, max_bytes=len(body) - 1, ttl=60),
+    ]:
+        assert cache.set("key", 0, CachedResponse(body)).gzip_body is None
+        assert cache.stats()["entries"] == 0
+
+
+@mongomock.patch(servers=(('localhost', 27017),))
+def test_search_uncached_compressed_by_middleware(monkeypatch):
+    from core.cache import search_cache
+
+    monkeypatch.setattr(search_cache, "max_entries", 0)
+    datas = [{"name": f"data-{i}", "metadata": data1["metadata"]} for i in range(10)]
+    for data in datas:
+        client.post(
+            "/api/v1/data",
+            headers={"Content-Type": "application/json", "X-API-KEY": API_KEY},
+            json=data
+        )
+
+    response = client.get("/api/v1/search?name^=data-", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.json() == datas
+
+    response = client.get("/api/v1/search?name^=data-", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in response.headers
+    assert response.json() == datas
+
+
+@mongomock.patch(servers=(('localhost', 27017),))
+def test_post_data_metadata_limits():
+    deep = {}
+    node = deep
+    for _ in range(20):
+        node["level"] = {}
+        node = node["level"]
+
+    for metadata in [
+        deep,
+        {f"key-{i}": "value" for i in range(1001)},
+        {"k" * 65: "value"},
+        {"key.with.dots": "value"},
+        {"key": "v" * 4097},
+        {"key": [["v" * 4097]]},
+    ]:
+        response = client.post(
+            "/api/v1/data",
+            headers={"Content-Type": "application/json", "X-API-KEY": API_KEY},
+            json={"name": "data-1", "metadata": metadata}
+        )
+        assert response.status_code == 422
+    assert client.get("/api/v1/data").json() == []
+
+
+@mongomock.patch(servers=(('localhost', 27017),))
+def test_post_data_body_too_large():
+    response = client.post(
+        "/api/v1/data",
+        headers={"Content-Type": "application/json", "X-API-KEY": API_KEY},
+        json={"name": "data-1", "metadata": {f"key-{i}": "v" * 4000 for i in range(100)}}
+    )
+    assert response.status_code == 413
+
+
+@mongomock.patch(servers=(('localhost', 27017),))
+def test_cache_invalidated_by_direct_write():
+    from core.cache import data_generation
+    from core.databases.mongo import MongoManager
+
+    assert client.get("/api/v1/data").json() == []
+    assert client.get("/api/v1/search?metadata.property-1.enabled=true").json() == []
+
+    # i.e. the dump command line tool writing to the db directly
+    mm = MongoManager()
+    mm.upsert_many([dict(data1)])
+    mm.bump_generation()
+    # seen once the process copy of the generation is refreshed
+    data_generation.refreshed = float("-inf")
+
+    assert client.get("/api/v1/data").json() == [data1]
+    assert client.get("/api/v1/search?metadata.property-1.enabled=true").json() == [data1]
+
+
+def test_trace_serialize_spans():
+    from utils.tracing import tracer
+
+    exported = []
+    export = tracer.exporter.export
+    tracer.exporter.export = lambda span: exported.append(span.name)
+    try:
+        with mongomock.patch(servers=(('localhost', 27017),)):
+            response = client.get(
+                "/api/v1/data/fake-data",
+                headers={"traceparent": "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"},
+            )
+            assert response.status_code == 404
+            client.post(
+                "/api/v1/data",
+                headers={
+                    "Content-Type": "application/json",
+                    "X-API-KEY": API_KEY,
+                    "traceparent": "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01",
+                },
+                json=data1
+            )
+            client.get(
+                "/api/v1/data",
+                headers={"traceparent": "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"},
+            )
+    finally:
+        tracer.exporter.export = export
+    assert "auth.apikey" in exported
+    assert "serialize.data" in exported
+    assert "serialize.listing" in exported
+
+
+@mongomock.patch(servers=(('localhost', 27017),))
+def test_cache_hit_served_from_memory():
+    from core.databases.mongo import MongoManager
+
+    client.get("/api/v1/search?metadata.property-1.enabled=true")
+    get_generation = MongoManager.get_generation
+    MongoManager.get_generation = lambda self: pytest.fail("generation read from db")
+    try:
+        response = client.get("/api/v1/search?metadata.property-1.enabled=true")
+    finally:
+        MongoManager.get_generation = get_generation
+    assert response.json() == []
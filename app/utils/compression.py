@@ -0,0 +1,36 @@
+from fastapi.requests import Request
+from fastapi.responses import Response
+
+from core.cache import CachedResponse
+
+
+def accepts_gzip(request: Request) -> bool:
+    """
+    Check Accept-Encoding for gzip not disabled with q=0.
+    """
+    for coding in request.headers.get("Accept-Encoding", "").split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() not in ("gzip", "*"):
+            continue
+        q = params.strip().lower()
+        if q.startswith("q="):
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def cached_json_response(request: Request, cached: CachedResponse) -> Response:
+    """
+    Return the pre-compressed body if the client accepts gzip,
+    GZipMiddleware leaves responses with Content-Encoding as they are.
+    """
+    headers = dict(cached.headers)
+    if cached.gzip_body is not None:
+        headers["Vary"] = "Accept-Encoding"
+        if accepts_gzip(request):
+            headers["Content-Encoding"] = "gzip"
+            return Response(content=cached.gzip_body, headers=headers, media_type="application/json")
+    return Response(content=cached.body, headers=headers, media_type="application/json")
@@ -0,0 +1,110 @@
+import cProfile
+import io
+import logging
+import pstats
+import random
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi.requests import Request
+
+from core.settings import ProfileSettings
+from dependencies import get_admin_user
+
+
+log = logging.getLogger()
+
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_SORT_KEYS = ("cumulative", "tottime", "calls")
+
+
+class ProfileStore:
+    """
+    Keep the latest profile reports in memory, oldest are dropped first.
+    """
+    def __init__(self, size: int):
+        self.size = size
+        self.profiles: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+
+    def add(self, report: str) -> str:
+        profile_id = uuid.uuid4().hex
+        with self.lock:
+            self.profiles[profile_id] = report
+            while len(self.profiles) > self.size:
+                self.profiles.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id: str) -> Optional[str]:
+        with self.lock:
+            return self.profiles.get(profile_id)
+
+
+class ProfilingMiddleware(BaseHTTPMiddleware):
+    """
+    Run requests under cProfile.
+
+    Admins (apikey or basic users) can send the X-Profile header to profile
+    a single request, the value is the pstats sort key (cumulative by default).
+    The report is stored in the profile store and linked from the response
+    with the X-Profile-Id and Link headers.
+    With PROFILE_SAMPLE_RATE above zero a share of all requests is profiled
+    and the top functions are written to the log.
+
+    cProfile only sees the event loop thread, so everything running on it
+    while the request is in flight is included, and sync dependencies
+    running in the threadpool are not. Only one request is profiled at a time.
+    """
+    def __init__(self, app, settings: ProfileSettings, store: ProfileStore):
+        super().__init__(app)
+        self.settings = settings
+        self.store = store
+        self.active = False
+
+    async def dispatch(self, request: Request, call_next):
+        on_demand = PROFILE_HEADER in request.headers
+        sampled = random.random() < self.settings.profile_sample_rate
+        if self.active or not (on_demand or sampled):
+            return await call_next(request)
+        if on_demand and await get_admin_user(request) is None:
+            log.info("Profiling requested by non-admin, ignored")
+            on_demand = False
+            if not sampled:
+                return await call_next(request)
+
+        sort_key = request.headers.get(PROFILE_HEADER, "").lower()
+        if sort_key not in PROFILE_SORT_KEYS:
+            sort_key = "cumulative"
+
+        self.active = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            response = await call_next(request)
+        finally:
+            profiler.disable()
+            self.active = False
+
+        if on_demand:
+            report = self.report(profiler, sort_key)
+            profile_id = self.store.add(report)
+            response.headers["X-Profile-Id"] = profile_id
+            response.headers["Link"] = f'</api/v1/profiles/{profile_id}>; rel="profile"'
+        if sampled:
+            report = self.report(profiler, "tottime")
+            log.info(f"Profile of {request.method} {request.url.path}:\n{report}")
+        return response
+
+    def report(self, profiler: cProfile.Profile, sort_key: str) -> str:
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats(sort_key).print_stats(self.settings.profile_top_n)
+        return stream.getvalue()
+
+
+profile_settings = ProfileSettings()
+profile_store = ProfileStore(profile_settings.profile_store_size)
@@ -0,0 +1,49 @@
+from typing import Callable
+
+from fastapi import HTTPException
+from fastapi.requests import Request
+from fastapi.responses import Response
+from fastapi.routing import APIRoute
+
+from core.schemas.data import metadata_settings
+
+
+class LimitedBodyRequest(Request):
+    """
+    Request refusing bodies larger than max_size,
+    checked against Content-Length first and then while reading the stream,
+    so oversized bodies are never fully read or decoded.
+    """
+    max_size = metadata_settings.data_max_body_size
+
+    async def body(self) -> bytes:
+        if not hasattr(self, "_body"):
+            # the name of the 413 constant differs between starlette versions
+            too_large = HTTPException(
+                status_code=413,
+                detail=f"Request body is larger than {self.max_size} bytes",
+            )
+            length = self.headers.get("Content-Length")
+            if length and length.isdigit() and int(length) > self.max_size:
+                raise too_large
+            body = bytearray()
+            async for chunk in self.stream():
+                body += chunk
+                if len(body) > self.max_size:
+                    raise too_large
+            self._body = bytes(body)
+        return self._body
+
+
+class LimitedBodyRoute(APIRoute):
+    """
+    Route reading request bodies with LimitedBodyRequest
+    """
+    def get_route_handler(self) -> Callable:
+        original_route_handler = super().get_route_handler()
+
+        async def custom_route_handler(request: Request) -> Response:
+            request = LimitedBodyRequest(request.scope, request.receive)
+            return await original_route_handler(request)
+
+        return custom_route_handler
@@ -0,0 +1,190 @@
+import json
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from pymongo import monitoring
+from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi.requests import Request
+
+from core.settings import TracingSettings
+
+
+TRACEPARENT_HEADER = "traceparent"
+TRACEPARENT_REGEX = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class Span:
+    """
+    Timed operation of a trace, spans of one trace share trace_id
+    and are linked to their parents with parent_id.
+    """
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes: Dict = {}
+        self.start = time.time_ns()
+        self.end: Optional[int] = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_ms": (self.end - self.start) / 1e6 if self.end else None,
+            "attributes": self.attributes,
+        }
+
+
+class Exporter:
+    """
+    Write finished spans as JSON lines to stdout or to a file.
+    """
+    def __init__(self, settings: TracingSettings):
+        self.settings = settings
+        self.stream = None
+        self.lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self.lock:
+            if self.stream is None:
+                if self.settings.trace_exporter == "file":
+                    self.stream = open(self.settings.trace_file, "a", buffering=1)
+                else:
+                    self.stream = sys.stdout
+            self.stream.write(line)
+
+
+class Tracer:
+    """
+    Create spans in the context of the current request.
+    Child spans of unsampled requests and spans outside of requests
+    are not recorded, so tracing costs almost nothing when sampling is off.
+    """
+    def __init__(self, settings: TracingSettings, exporter: Exporter):
+        self.settings = settings
+        self.exporter = exporter
+        self.current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+    def start_trace(self, name: str, traceparent: Optional[str] = None) -> Span:
+        """
+        Start a root span, continuing the trace from a W3C traceparent header if valid.
+        The sampling decision of the parent is kept, otherwise sample rate is applied.
+        """
+        match = TRACEPARENT_REGEX.match(traceparent or "")
+        if match and match.group(1) != "0" * 32:
+            trace_id, parent_id, flags = match.groups()
+            sampled = bool(int(flags, 16) & 1)
+        else:
+            trace_id, parent_id = secrets.token_hex(16), None
+            sampled = random.random() < self.settings.trace_sample_rate
+        return Span(name, trace_id, parent_id, sampled)
+
+    def start_span(self, name: str) -> Optional[Span]:
+        parent = self.current.get()
+        if parent is None or not parent.sampled:
+            return None
+        return Span(name, parent.trace_id, parent.span_id, True)
+
+    def finish(self, span: Optional[Span]) -> None:
+        if span is None:
+            return
+        span.end = time.time_ns()
+        if span.sampled:
+            self.exporter.export(span)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        span = self.start_span(name)
+        if span is None:
+            yield None
+            return
+        span.attributes.update(attributes)
+        token = self.current.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.attributes["error"] = repr(e)
+            raise
+        finally:
+            self.current.reset(token)
+            self.finish(span)
+
+
+class TracingMiddleware(BaseHTTPMiddleware):
+    """
+    Wrap every request in a root span and return its traceparent header.
+    """
+    def __init__(self, app, tracer: Tracer):
+        super().__init__(app)
+        self.tracer = tracer
+
+    async def dispatch(self, request: Request, call_next):
+        span = self.tracer.start_trace(
+            f"{request.method} {request.url.path}",
+            request.headers.get(TRACEPARENT_HEADER),
+        )
+        token = self.tracer.current.set(span)
+        try:
+            response = await call_next(request)
+            span.attributes["status_code"] = response.status_code
+        finally:
+            self.tracer.current.reset(token)
+            self.tracer.finish(span)
+        response.headers[TRACEPARENT_HEADER] = span.traceparent
+        return response
+
+
+class MongoCommandTracer(monitoring.CommandListener):
+    """
+    Record a span for each mongo command,
+    pymongo calls the listener in the thread running the command.
+    """
+    def __init__(self, tracer: Tracer):
+        self.tracer = tracer
+        self.spans: Dict = {}
+        self.lock = threading.Lock()
+
+    def started(self, event):
+        span = self.tracer.start_span(f"mongo.{event.command_name}")
+        if span is None:
+            return
+        span.attributes["db"] = event.database_name
+        with self.lock:
+            self.spans[(event.request_id, event.connection_id)] = span
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event, error=str(event.failure))
+
+    def _finish(self, event, error: Optional[str] = None):
+        with self.lock:
+            span = self.spans.pop((event.request_id, event.connection_id), None)
+        if span is None:
+            return
+        if error:
+            span.attributes["error"] = error
+        self.tracer.finish(span)
+
+
+tracing_settings = TracingSettings()
+tracer = Tracer(tracing_settings, Exporter(tracing_settings))
+monitoring.register(MongoCommandTracer(tracer))
@@ -0,0 +1,65 @@
+import logging
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from core.databases.mongo import MongoManager
+from core.dump import DumpError, export_dump, import_dump
+from core.schemas.dump import ImportResult
+from core.schemas.users import User
+from core.settings import DumpSettings
+from typing_extensions import Annotated
+from dependencies import admin_check
+
+
+log = logging.getLogger()
+
+
+router = APIRouter(
+    prefix="/api/v1/admin",
+    tags=["admin"],
+)
+
+
+@router.get("/export")
+async def export_data(
+    mm: Annotated[MongoManager, Depends(MongoManager)],
+    user: User = Depends(admin_check),
+):
+    """
+    Stream all data as gzip compressed NDJSON,
+    the last line holds the checksum of the records
+    """
+
+    log.info(f"connected as user: {user.login}")
+
+    return StreamingResponse(
+        export_dump(mm, DumpSettings()),
+        media_type="application/gzip",
+        headers={"Content-Disposition": 'attachment; filename="data.ndjson.gz"'},
+    )
+
+
+@router.post("/import", response_model=ImportResult)
+async def import_data(
+    mm: Annotated[MongoManager, Depends(MongoManager)],
+    dump: UploadFile = File(),
+    offset: int = Query(default=0, ge=0),
+    user: User = Depends(admin_check),
+):
+    """
+    Load data from a dump made by export (existing data with the same name is replaced),
+    pass offset to skip records loaded by an interrupted import,
+    returns 400 with the offset to resume from if the dump can not be loaded,
+    offset is null if the dump is incomplete or altered and nothing was loaded
+    """
+
+    log.info(f"connected as user: {user.login}")
+
+    try:
+        return await run_in_threadpool(import_dump, mm, dump.file, DumpSettings(), offset)
+    except DumpError as e:
+        log.error(f"Failed to import dump: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"message": str(e), "offset": e.offset},
+        )
@@ -57,7 +57,7 @@ async def login_for_access_token(
     )
     sec_settings = SecuritySettings()
     ext_db = ExternalDB()
-    user = ext_db.authenticate_user(form_data.username, form_data.password)
+    user = await ext_db.authenticate_user(form_data.username, form_data.password)
     if not user:
         log.warn("Unable to fetch the user")
         raise credentials_exception
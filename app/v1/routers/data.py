@@ -1,9 +1,14 @@
 import logging
-from fastapi import APIRouter, Path, HTTPException, status, Depends
-from core.schemas.data import Data
+from fastapi import APIRouter, Path, HTTPException, Request, status, Depends
+from fastapi.responses import Response
+from core.schemas.data import Data, DataList, DataPayload
 from core.databases.mongo import MongoManager
+from core.cache import CachedResponse, data_generation, listing_cache
+from utils.compression import cached_json_response
+from utils.routing import LimitedBodyRoute
+from utils.tracing import tracer
 from core.schemas.users import User
-from typing import List
+from typing import Dict, List
 from typing_extensions import Annotated
 from dependencies import auth_check
 
@@ -14,16 +19,38 @@ log = logging.getLogger()
 router = APIRouter(
     prefix="/api/v1/data",
     tags=["data"],
+    route_class=LimitedBodyRoute,
 )
 
 
+def data_response(data: Dict, status_code: int = status.HTTP_200_OK) -> Response:
+    """
+    Validate and encode data as response_model would, recording it as a span
+    """
+    with tracer.span("serialize.data"):
+        body = Data.model_validate(data).model_dump_json()
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+
 @router.get("", response_model=List[Data])
-async def read_all_data(mm: Annotated[MongoManager, Depends(MongoManager)]):
+async def read_all_data(
+    request: Request,
+    mm: Annotated[MongoManager, Depends(MongoManager)],
+):
     """
-    Get all data
+    Get all data,
+    the encoded and compressed listing is cached until the next write to the data
     """
 
-    return mm.find_all_data()
+    generation = data_generation.get(mm)
+    cached = listing_cache.get("", generation)
+    if cached is None:
+        found = mm.find_all_data()
+        with tracer.span("serialize.listing", results=len(found)):
+            body = DataList.dump_json(DataList.validate_python(found))
+        cached = listing_cache.set("", generation, CachedResponse(body))
+
+    return cached_json_response(request, cached)
 
 
 @router.get("/{name}", response_model=Data)
@@ -43,13 +70,13 @@ async def read_data(
             detail="Data not found"
         )
 
-    return data_found
+    return data_response(data_found)
 
 
 @router.post("", status_code=status.HTTP_201_CREATED, response_model=Data)
 async def create_data(
     mm: Annotated[MongoManager, Depends(MongoManager)],
-    data: Data,
+    data: DataPayload,
     user: User = Depends(auth_check),
 ):
     """
@@ -70,6 +97,7 @@ async def create_data(
 
     try:
         mm.insert_one(data.model_dump())
+        data_generation.bump(mm)
     except Exception as e:
         log.error(f"Failed to save data to db: {e}")
         raise HTTPException(
@@ -84,13 +112,13 @@ async def create_data(
             detail="Data was not created"
         )
 
-    return data_created_found
+    return data_response(data_created_found, status.HTTP_201_CREATED)
 
 
 @router.put("/{name}", response_model=Data)
 async def update_data(
     mm: Annotated[MongoManager, Depends(MongoManager)],
-    data: Data,
+    data: DataPayload,
     name: str = Path(examples=["name"]),
     user: User = Depends(auth_check),
 ):
@@ -121,6 +149,7 @@ async def update_data(
 
     try:
         mm.replace_one(name, data.model_dump())
+        data_generation.bump(mm)
     except Exception as e:
         log.error(f"Failed to replace data in db: {e}")
         raise HTTPException(
@@ -130,7 +159,7 @@ async def update_data(
 
     data_updated_found = mm.find_one(new_name)
 
-    return data_updated_found
+    return data_response(data_updated_found)
 
 
 @router.delete("/{name}", response_model=Data)
@@ -155,6 +184,7 @@ async def delete_data(
 
     try:
         mm.delete_one(name)
+        data_generation.bump(mm)
     except Exception as e:
         log.error(f"Failed to delete data from db: {e}")
         raise HTTPException(
@@ -162,6 +192,4 @@ async def delete_data(
             detail="Backend failed to delete data"
         )
 
-    data_deleted = Data(**data_found)
-
-    return data_deleted
+    return data_response(data_found)
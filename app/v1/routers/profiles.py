@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, HTTPException, Path, status
+from fastapi.responses import PlainTextResponse
+from core.schemas.users import User
+from dependencies import admin_check
+from utils.profiling import profile_store
+
+
+router = APIRouter(
+    prefix="/api/v1/profiles",
+    tags=["profiles"],
+)
+
+
+@router.get("/{profile_id}", response_class=PlainTextResponse)
+async def read_profile(
+    profile_id: str = Path(examples=["id"]),
+    user: User = Depends(admin_check),
+):
+    """
+    Get profile report of a request made with X-Profile header,
+    returns 404 if the profile is not found (or already dropped)
+    """
+
+    report = profile_store.get(profile_id)
+    if report is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+
+    return report
@@ -1,8 +1,12 @@
 import logging
+from urllib.parse import quote
 from fastapi import APIRouter, Depends, Request, HTTPException, status
-from pydantic import ValidationError
-from core.schemas.data import Data, DataQuery
+from core.schemas.data import Data, DataQuery, DataList, NameQuery
+from core.schemas.cache import CacheStats
 from core.databases.mongo import MongoManager
+from core.cache import CachedResponse, data_generation, normalize_query, search_cache
+from utils.tracing import tracer
+from utils.compression import cached_json_response
 from typing import List
 from typing_extensions import Annotated
 
@@ -16,23 +20,65 @@ router = APIRouter(
 )
 
 
+def search_data(mm: MongoManager, query: str) -> CachedResponse:
+    """
+    Run equality query, or name prefix and range query with paging.
+    Name queries return the name to continue after (percent-encoded)
+    in X-Next-After header if there are more results.
+    """
+    with tracer.span("validate.query"):
+        if NameQuery.matches(query):
+            name_query = NameQuery.from_query(query)
+        else:
+            name_query = None
+            DataQuery(query=query)
+
+    headers = {}
+    if name_query is None:
+        found = mm.find_data(query)
+    else:
+        found = mm.find_by_name(name_query.to_filter(), name_query.limit + 1)
+        if len(found) > name_query.limit:
+            found = found[:name_query.limit]
+            headers["X-Next-After"] = quote(found[-1]["name"], safe="")
+    with tracer.span("serialize.search", results=len(found)):
+        body = DataList.dump_json(DataList.validate_python(found))
+    return CachedResponse(body, headers)
+
+
 @router.get("", response_model=List[Data])
 async def read_data(
     request: Request,
     mm: Annotated[MongoManager, Depends(MongoManager)],
 ):
     """
-    Search for data with query
+    Search for data with query, either metadata.key=value (or name=value)
+    or name prefix and range: name^=prefix, name>=from, name<to, limit=N, after=name,
+    results are cached until the next write to the data
     """
 
-    query = request.url.query
+    query = normalize_query(request.url.query)
     log.info(f"search query passed to db: {query}")
-    try:
-        DataQuery(query=query)
-    except ValidationError:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Query is malformed"
-        )
-
-    return mm.find_data(query)
+
+    generation = data_generation.get(mm)
+    cached = search_cache.get(query, generation)
+    if cached is None:
+        try:
+            cached = search_data(mm, query)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Query is malformed"
+            )
+        cached = search_cache.set(query, generation, cached)
+
+    return cached_json_response(request, cached)
+
+
+@router.get("/cache", response_model=CacheStats)
+async def read_cache_stats():
+    """
+    Get search cache size and hit rate
+    """
+
+    return search_cache.stats()